@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import Dict
+from typing import List
 
 
 @dataclass
@@ -9,15 +9,51 @@ class UpdateCommand:
 
 @dataclass
 class UpdateVehicleCommand:
-    def __init__(self, traffic_light_states: Dict[str, str], crossing_states: Dict[str, bool] = None, occupied_cells=None):
-        self.traffic_light_states = traffic_light_states
-        self.crossing_states = crossing_states or {}
-        self.occupied_cells = occupied_cells or {}
+    # Read-only per-tick snapshots, indexed by the 0-based ids the grid
+    # assigns in grid.traffic_light_index_by_pos / crossing_index_by_pos.
+    # Plain lists so the message stays JSON-serializable for the runtime.
+    tl_red: List[bool]        # tl_red[i] is True while traffic_light_{i+1} is red
+    pc_active: List[bool]     # pc_active[i] is True while crossing_{i+1} is active
+
+
+@dataclass
+class TrafficLightTickResult:
+    # Reply from a traffic light: the state holding from this tick, and
+    # the first tick at which it changes again (its next wakeup).
+    state: str
+    next_change: int
+
+
+@dataclass
+class CrossingTickResult:
+    # Reply from a pedestrian crossing: whether it is active from this
+    # tick, and the first tick at which that may change.
+    state: bool
+    next_change: int
+
+
+# Bit layout for VehicleTickResult.flags
+VF_PARKED = 1
+VF_EXITING_DELAY = 2
+VF_EXITING = 4
+
+
+@dataclass
+class VehicleTickResult:
+    # Snapshot of a vehicle's state after one update, returned as the
+    # send_message reply. Plain scalars so the message stays
+    # JSON-serializable for the runtime; the three status booleans are
+    # packed into one flags int (VF_* bits).
+    row: int
+    col: int
+    direction: str
+    wait_time: int
+    flags: int
 
 
 @dataclass
 class ParkingRequestCommand:
-    vehicle_id: str
+    vehicle_id: int
     current_time: int
 
 
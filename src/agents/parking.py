@@ -1,9 +1,30 @@
+import heapq
+import logging
 import random
 from typing import Dict, Tuple
+
+import numpy as np
 from autogen_core import RoutedAgent, message_handler, MessageContext
 
 from src.agents.messages import UpdateCommand, ParkingRequestCommand, ParkingResponseCommand
 
+# Shared PCG64 generator for parking-duration draws. Standard normals are
+# drawn in batches so the per-request cost is a buffer pop instead of a
+# Mersenne Twister call.
+_rng = np.random.default_rng()
+_NORMAL_BATCH = 128
+_normal_buffer = []
+
+
+logger = logging.getLogger(__name__)
+
+
+def _next_standard_normal() -> float:
+    """Pop one standard-normal sample from the pre-drawn batch."""
+    if not _normal_buffer:
+        _normal_buffer.extend(_rng.standard_normal(_NORMAL_BATCH).tolist())
+    return _normal_buffer.pop()
+
 
 class ParkingAgent(RoutedAgent):
     def __init__(self, parking_id: int, parking_type: str, capacity: int,
@@ -14,11 +35,19 @@ class ParkingAgent(RoutedAgent):
         self.capacity = capacity
         self.avg_parking_time = avg_parking_time
         self.position = position
-        self.parked_vehicles = {}  # vehicle_id -> parking_end_time
+        self.parked_vehicles = {}  # int vehicle_id -> parking_end_time
+        # Min-heap of (exit_time, vehicle_id) so expiry checks only touch
+        # the entries that are actually due. Stale entries (vehicle re-parked
+        # with a new end time) are skipped on pop.
+        self._expiry_heap = []
 
-        # Initialize with some parked vehicles if specified
+        # Initialize with some parked vehicles if specified; negative ids
+        # keep the pre-seeded vehicles out of the real id space.
         for i in range(initial_occupancy):
-            self.parked_vehicles[f"initial_vehicle_{i}_{parking_id}"] = random.randint(1, avg_parking_time * 2)
+            vehicle_id = -(i + 1)
+            exit_time = random.randint(1, avg_parking_time * 2)
+            self.parked_vehicles[vehicle_id] = exit_time
+            heapq.heappush(self._expiry_heap, (exit_time, vehicle_id))
 
     @message_handler
     async def handle_parking_request(self, message: ParkingRequestCommand, ctx: MessageContext) -> None:
@@ -27,15 +56,17 @@ class ParkingAgent(RoutedAgent):
 
         if has_space:
             # Calculate random parking duration based on average
-            parking_duration = int(random.gauss(self.avg_parking_time, self.avg_parking_time / 3))
+            parking_duration = int(self.avg_parking_time +
+                                   (self.avg_parking_time / 3) * _next_standard_normal())
             parking_end_time = message.current_time + max(1, parking_duration)
 
             # Add vehicle to parked vehicles
             self.parked_vehicles[message.vehicle_id] = parking_end_time
-            print(
-                f"{self.id}: Accepted parking request from {message.vehicle_id}, will exit at time {parking_end_time}")
+            heapq.heappush(self._expiry_heap, (parking_end_time, message.vehicle_id))
+            logger.debug(
+                "%s: Accepted parking request from %s, will exit at time %s", self.id, message.vehicle_id, parking_end_time)
         else:
-            print(f"{self.id}: Rejected parking request from {message.vehicle_id}, no capacity available")
+            logger.debug("%s: Rejected parking request from %s, no capacity available", self.id, message.vehicle_id)
 
         # Send response back to vehicle
         await self.send_message(
@@ -47,15 +78,13 @@ class ParkingAgent(RoutedAgent):
     async def handle_update(self, message: UpdateCommand, ctx: MessageContext) -> None:
         # Update parking status, remove vehicles that have finished parking
         current_time = getattr(message, 'current_time', 0)
-        vehicles_to_remove = []
-
-        for vehicle_id, exit_time in self.parked_vehicles.items():
-            if current_time >= exit_time:
-                vehicles_to_remove.append(vehicle_id)
 
-        for vehicle_id in vehicles_to_remove:
-            del self.parked_vehicles[vehicle_id]
-            print(f"{self.id}: Vehicle {vehicle_id} exited parking")
+        while self._expiry_heap and self._expiry_heap[0][0] <= current_time:
+            exit_time, vehicle_id = heapq.heappop(self._expiry_heap)
+            # Skip stale entries whose end time was superseded
+            if self.parked_vehicles.get(vehicle_id) == exit_time:
+                del self.parked_vehicles[vehicle_id]
+                logger.debug("%s: Vehicle %s exited parking", self.id, vehicle_id)
 
         # Report status
-        print(f"{self.id}: type={self.parking_type}, capacity={self.capacity}, occupied={len(self.parked_vehicles)}")
\ No newline at end of file
+        logger.debug("%s: type=%s, capacity=%s, occupied=%s", self.id, self.parking_type, self.capacity, len(self.parked_vehicles))
\ No newline at end of file
@@ -2,16 +2,18 @@ from autogen_core import RoutedAgent, message_handler, MessageContext
 import random
 from typing import Tuple
 
-from src.agents.messages import UpdateCommand
+from src.agents.messages import UpdateCommand, CrossingTickResult
 from src.agents.veichle import VehicleAgent
 
 
 class PedestrianCrossingAgent(RoutedAgent):
-    def __init__(self, crossing_id: int, position: Tuple[int, int] = None, lanes: int = 1, active_duration: int = None):
+    def __init__(self, crossing_id: int, position: Tuple[int, int] = None, lanes: int = 1, active_duration: int = None,
+                 grid=None):
         super().__init__(f"PedestrianCrossingAgent-{crossing_id}")
         self.crossing_id = crossing_id
         self.position = position  # Store the crossing's position
         self.lanes = lanes
+        self.grid = grid
 
         # Use provided duration or default based on lanes
         if active_duration is not None:
@@ -20,32 +22,42 @@ class PedestrianCrossingAgent(RoutedAgent):
             self.active_duration = 3 if lanes > 1 else 1
 
         self.active = False
-        self.timer = 0
+        # Tick at which the current activation expires; lets the scheduler
+        # skip ticks where the state cannot change.
+        self._active_until = 0
 
-    @message_handler
-    async def handle_update(self, message: UpdateCommand, ctx: MessageContext) -> None:
-        # If active, count down timer
+    def step(self, tick: int) -> bool:
+        """Advance the crossing to the given tick and return whether it is active."""
+        # Deactivate once the activation window has elapsed
         if self.active:
-            self.timer += 1
-            # Deactivate after duration expires
-            if self.timer >= self.active_duration:
+            if tick >= self._active_until:
                 self.active = False
-                self.timer = 0
         else:
             # Only attempt to activate if we have position info
             if self.position:
                 # Check if position is clear of vehicles before activating
-                position_is_clear = self.position not in VehicleAgent._all_vehicle_positions
+                if self.grid is not None:
+                    position_is_clear = self.grid.occupancy[self.position] == 0
+                else:
+                    position_is_clear = self.position not in VehicleAgent._vehicle_cell.values()
 
                 # Random activation with 30% probability, but only if clear of vehicles
                 if position_is_clear and random.random() < 0.3:
                     self.active = True
-                    self.timer = 0
-                    print(f"{self.id}: Activated crossing at {self.position} (clear of vehicles)")
+                    self._active_until = tick + self.active_duration
             else:
                 # Fallback to original behavior if position unknown
                 if random.random() < 0.3:
                     self.active = True
-                    self.timer = 0
+                    self._active_until = tick + self.active_duration
+
+        return self.active
 
-        print(f"{self.id}: active={self.active}, timer={self.timer}, lanes={self.lanes}")
\ No newline at end of file
+    @message_handler
+    async def handle_update(self, message: UpdateCommand, ctx: MessageContext) -> CrossingTickResult:
+        tick = message.current_time
+        active = self.step(tick)
+        # While active the state is fixed until the window expires; while
+        # inactive the random draw must run again next tick.
+        next_change = self._active_until if active else tick + 1
+        return CrossingTickResult(active, next_change)
\ No newline at end of file
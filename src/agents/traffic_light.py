@@ -1,6 +1,6 @@
 from autogen_core import RoutedAgent, MessageContext, message_handler
 
-from src.agents.messages import UpdateCommand
+from src.agents.messages import UpdateCommand, TrafficLightTickResult
 
 
 class TrafficLightAgent(RoutedAgent):
@@ -13,19 +13,33 @@ class TrafficLightAgent(RoutedAgent):
         # Set initial state based on light_id
         self.current_state = 'green' if light_id % 3 == 0 else 'red'
 
-        # Set initial timer with offset based on light_id
+        # The light is periodic, so its state is a pure function of the
+        # global tick: red iff (tick + offset) % cycle < red_duration.
+        # The offset encodes the per-light starting phase that the old
+        # stateful timer produced (initial timer light_id % duration,
+        # incremented before the first comparison).
+        self._cycle = red_duration + green_duration
         if self.current_state == 'red':
-            self.timer = light_id % self.red_duration
+            self._offset = (light_id % red_duration) + 1
         else:
-            self.timer = light_id % self.green_duration
+            self._offset = red_duration + (light_id % green_duration) + 1
 
-    @message_handler
-    async def handle_update(self, message: UpdateCommand, ctx: MessageContext) -> None:
-        self.timer += 1
-        if self.current_state == 'red' and self.timer >= self.red_duration:
-            self.current_state = 'green'
-            self.timer = 0
-        elif self.current_state == 'green' and self.timer >= self.green_duration:
+    def state_at(self, tick: int) -> str:
+        """Return the light state at the given simulation tick."""
+        if (tick + self._offset) % self._cycle < self.red_duration:
             self.current_state = 'red'
-            self.timer = 0
-        print(f"{self.id}: state={self.current_state}, timer={self.timer}")
\ No newline at end of file
+        else:
+            self.current_state = 'green'
+        return self.current_state
+
+    def next_change_after(self, tick: int) -> int:
+        """Return the first tick after `tick` at which the state flips."""
+        phase = (tick + self._offset) % self._cycle
+        if phase < self.red_duration:
+            return tick + (self.red_duration - phase)
+        return tick + (self._cycle - phase)
+
+    @message_handler
+    async def handle_update(self, message: UpdateCommand, ctx: MessageContext) -> TrafficLightTickResult:
+        tick = message.current_time
+        return TrafficLightTickResult(self.state_at(tick), self.next_change_after(tick))
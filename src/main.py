@@ -1,6 +1,12 @@
 import asyncio
 import argparse
 
+try:
+    import uvloop
+except ImportError:
+    # uvloop is optional (and POSIX-only); the stdlib loop works fine.
+    uvloop = None
+
 from autogen_core import SingleThreadedAgentRuntime
 from src.simulation.simulation import run_simulation
 
@@ -22,6 +28,9 @@ async def main():
     parser.add_argument('--pedestrian-crossing-timing', type=str, default='1,3',
                         help='Tuple for crossing durations (default: 1,3)')
 
+    parser.add_argument('--no-real-time', action='store_true',
+                        help='Disable wall-clock pacing (benchmark/headless mode)')
+
     parser.add_argument('--avg-parking-time', type=int, default=5,
                         help='Average time vehicles remain parked (default: 5)')
     parser.add_argument('--parking-delay-steps', type=int, default=4,
@@ -32,6 +41,7 @@ async def main():
     # Convert string tuples to actual tuples
     traffic_light_timing = tuple(map(int, args.traffic_light_timing.split(',')))
     pedestrian_crossing_timing = tuple(map(int, args.pedestrian_crossing_timing.split(',')))
+    real_time = not args.no_real_time
 
     # Initialize the runtimes
     runtime_no_parking = SingleThreadedAgentRuntime()
@@ -49,7 +59,8 @@ async def main():
             pedestrian_crossing_timing=pedestrian_crossing_timing,
             with_parking=True,
             avg_parking_time=args.avg_parking_time,
-            parking_delay_steps=args.parking_delay_steps
+            parking_delay_steps=args.parking_delay_steps,
+            real_time=real_time
         )
         await runtime_with_parking.stop()
         await runtime_with_parking.close()
@@ -63,7 +74,8 @@ async def main():
             road_size=args.road_size,
             traffic_light_timing=traffic_light_timing,
             pedestrian_crossing_timing=pedestrian_crossing_timing,
-            with_parking=False
+            with_parking=False,
+            real_time=real_time
         )
         await runtime_no_parking.stop()
         await runtime_no_parking.close()
@@ -79,11 +91,15 @@ async def main():
             pedestrian_crossing_timing=pedestrian_crossing_timing,
             with_parking=True,
             avg_parking_time=args.avg_parking_time,
-            parking_delay_steps=args.parking_delay_steps
+            parking_delay_steps=args.parking_delay_steps,
+            real_time=real_time
         )
         await runtime_with_parking.stop()
         await runtime_with_parking.close()
 
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        # Cuts per-message scheduling overhead of the async agent handlers.
+        uvloop.install()
     asyncio.run(main())
\ No newline at end of file
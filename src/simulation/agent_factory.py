@@ -1,6 +1,7 @@
 from typing import Tuple, List, Dict
 
 from autogen_core import (
+    AgentId,
     SingleThreadedAgentRuntime,
 )
 
@@ -41,20 +42,21 @@ async def register_pedestrian_crossings(runtime: SingleThreadedAgentRuntime, gri
             runtime,
             agent_id,
             lambda i_val=i, pos_val=pos, lanes_val=lanes, active_duration=duration:
-            PedestrianCrossingAgent(i_val + 1, position=pos_val, lanes=lanes_val, active_duration=active_duration)
+            PedestrianCrossingAgent(i_val + 1, position=pos_val, lanes=lanes_val, active_duration=active_duration,
+                                    grid=grid)
         )
         crossing_agents.append(agent_id)
     return crossing_agents
 
 
 async def create_new_vehicle(runtime: SingleThreadedAgentRuntime, grid: RoadGrid, vehicle_id: int,
-                             vehicle_ids: List[str], vehicle_pending: List[str],
+                             vehicle_ids: Dict[str, None], vehicle_pending: set,
                              vehicle_wait_times: Dict[str, int]) -> None:
     """Create a new vehicle and register it."""
     vehicle_key = f"vehicle_{vehicle_id}"
     await VehicleAgent.register(runtime, vehicle_key, lambda: VehicleAgent(vehicle_id, grid))
-    vehicle_ids.append(vehicle_key)
-    vehicle_pending.append(vehicle_key)
+    vehicle_ids[vehicle_key] = None
+    vehicle_pending.add(vehicle_key)
     vehicle_wait_times[vehicle_key] = 0
 
 
@@ -85,6 +87,8 @@ async def register_parking_agents(runtime: SingleThreadedAgentRuntime, grid: Roa
                 )
                 parking_agents.append(agent_id)
                 parking_id += 1
-                VehicleAgent._parking_positions_to_agent_ids[(r, c)] = agent_id
+                # Cache the AgentId handle so vehicles don't rebuild one
+                # per parking attempt
+                VehicleAgent._parking_positions_to_agent_ids[(r, c)] = AgentId(agent_id, "default")
 
     return parking_agents
\ No newline at end of file
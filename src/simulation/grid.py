@@ -1,8 +1,49 @@
+import pickle
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import List, Tuple
 
-
-@dataclass
+import numpy as np
+
+# Built grids are deterministic for a given (rows, cols), so they are
+# pickled here once and reloaded on later runs.
+_GRID_CACHE_DIR = Path(".grid_cache")
+
+# Feature bit flags, precomputed per cell so hot-path checks are a single
+# integer AND instead of a string membership scan over cell.features.
+DIR_NORTH = 1
+DIR_SOUTH = 2
+DIR_EAST = 4
+DIR_WEST = 8
+F_TRAFFIC_LIGHT = 16
+F_PEDESTRIAN_CROSSING = 32
+F_ROAD = 64
+F_PARKING = 128
+
+DIR_MASKS = {
+    "northbound": DIR_NORTH,
+    "southbound": DIR_SOUTH,
+    "eastbound": DIR_EAST,
+    "westbound": DIR_WEST,
+}
+
+# Direction -> display arrow, used when rendering cells.
+_DIR_ARROWS = {
+    "northbound": "↑",
+    "southbound": "↓",
+    "eastbound": "→",
+    "westbound": "←",
+}
+
+FEATURE_BITS = {
+    **DIR_MASKS,
+    "traffic_light": F_TRAFFIC_LIGHT,
+    "pedestrian_crossing": F_PEDESTRIAN_CROSSING,
+    "parking": F_PARKING,
+}
+
+
+@dataclass(slots=True)
 class RoadCell:
     cell_type: str
     lanes: int
@@ -10,6 +51,20 @@ class RoadCell:
     capacity: int = 0
     parking_type: str = None
     parking_capacity: int = 0
+    mask: int = 0
+    allowed_dirs: Tuple[str, ...] = ()
+    # Cached short_repr string; features are frozen once the grid is
+    # built, so the rendering never needs invalidating.
+    _repr: str = None
+
+    def compute_mask(self) -> int:
+        """Fold cell_type and the feature strings into the integer bitmask."""
+        mask = F_ROAD if self.cell_type == "road" else 0
+        for feature in self.features:
+            mask |= FEATURE_BITS.get(feature, 0)
+        self.mask = mask
+        self.allowed_dirs = tuple(d for d in self.features if d in DIR_MASKS)
+        return mask
 
     def short_repr(self) -> str:
         """
@@ -19,6 +74,11 @@ class RoadCell:
          - Lane count if > 1
          - Special features (traffic light, pedestrian crossing, etc.)
         """
+        if self._repr is None:
+            self._repr = self._render_repr()
+        return self._repr
+
+    def _render_repr(self) -> str:
         # 1) Handle empty cells
         if self.cell_type == "empty":
             return "."
@@ -30,18 +90,9 @@ class RoadCell:
             else:
                 return "[B]"   # generic building
 
-        # 3) Handle road cells
-        direction_symbol = ""
-        if "northbound" in self.features:
-            direction_symbol = "↑"
-        elif "southbound" in self.features:
-            direction_symbol = "↓"
-        elif "eastbound" in self.features:
-            direction_symbol = "→"
-        elif "westbound" in self.features:
-            direction_symbol = "←"
-        else:
-            direction_symbol = "?"  # fallback if no direction
+        # 3) Handle road cells: first direction tag wins, "?" if none
+        direction_symbol = next(
+            (_DIR_ARROWS[f] for f in self.features if f in _DIR_ARROWS), "?")
 
         # Show lane count if more than 1
         if self.lanes > 1:
@@ -70,6 +121,151 @@ class RoadGrid:
         self.rows = rows
         self.cols = cols
         self.grid = self._build_grid()
+        self._index_special_cells()
+
+        self.entry_points = self._compute_entry_points()
+        self.exit_points = self._compute_exit_points()
+
+        # Structure-of-arrays mirrors of the cell grid: one contiguous array
+        # per attribute touched on the movement hot path, so agents read a
+        # single machine word instead of chasing cell objects.
+        self.mask_array = np.array(
+            [[cell.mask for cell in row] for row in self.grid], dtype=np.uint8)
+        self.lanes_array = np.array(
+            [[cell.lanes for cell in row] for row in self.grid], dtype=np.uint8)
+
+        # Static neighbor coordinates per cell and direction (N, S, E, W),
+        # -1 where the step would leave the grid, so the movement kernel
+        # does table reads instead of bounds arithmetic.
+        self.neighbor_rows = np.full((rows, cols, 4), -1, dtype=np.int16)
+        self.neighbor_cols = np.full((rows, cols, 4), -1, dtype=np.int16)
+        for i, (dr, dc) in enumerate(((-1, 0), (1, 0), (0, 1), (0, -1))):
+            for r in range(rows):
+                nr = r + dr
+                if not 0 <= nr < rows:
+                    continue
+                for c in range(cols):
+                    nc = c + dc
+                    if 0 <= nc < cols:
+                        self.neighbor_rows[r, c, i] = nr
+                        self.neighbor_cols[r, c, i] = nc
+
+        # Static per-cell intersection flag: two or more allowed directions.
+        # Popcount of the low 4 (direction) mask bits via a 16-entry table.
+        popcount4 = np.array([bin(v).count("1") for v in range(16)], dtype=np.uint8)
+        self.is_intersection = popcount4[self.mask_array & 0x0F] >= 2
+
+        # Static per-cell turn flag: True where the neighbor scan can offer
+        # more than "continue straight" — a multi-direction cell, or a
+        # single-direction cell with a perpendicular neighbor that carries
+        # its own direction bit (a junction between crossing one-way
+        # streets). Cells where this is False only ever yield the forward
+        # move, so vehicles there may skip the full scan.
+        opposite_bits = {DIR_NORTH: DIR_SOUTH, DIR_SOUTH: DIR_NORTH,
+                         DIR_EAST: DIR_WEST, DIR_WEST: DIR_EAST}
+        self.offers_turn = self.is_intersection.copy()
+        for r in range(rows):
+            for c in range(cols):
+                cell_dirs = int(self.mask_array[r, c]) & 0x0F
+                if cell_dirs == 0 or self.offers_turn[r, c]:
+                    continue
+                for i in range(4):
+                    bit = 1 << i
+                    if bit == cell_dirs or bit == opposite_bits[cell_dirs]:
+                        continue
+                    nr = self.neighbor_rows[r, c, i]
+                    if nr >= 0 and self.mask_array[nr, self.neighbor_cols[r, c, i]] & bit:
+                        self.offers_turn[r, c] = True
+                        break
+
+        # Number of vehicles currently in each cell; kept in sync with the
+        # vehicle position registry so neighbor checks are O(1) array reads.
+        self.occupancy = np.zeros((rows, cols), dtype=np.int16)
+
+    def _compute_entry_points(self) -> List[Tuple[int, int]]:
+        """
+        Scan the edges of the grid once for road cells whose direction leads
+        into the map. Vehicles pick a random entry from this cached list
+        instead of re-scanning the perimeter on every construction.
+        """
+        entry_points = []
+
+        # Top edge (row 0) and bottom edge (last row)
+        for c in range(self.cols):
+            if self.grid[0][c].mask & DIR_SOUTH:
+                entry_points.append((0, c))
+            if self.grid[self.rows - 1][c].mask & DIR_NORTH:
+                entry_points.append((self.rows - 1, c))
+
+        # Left and right edges (skip corners which are already checked)
+        for r in range(1, self.rows - 1):
+            if self.grid[r][0].mask & DIR_EAST:
+                entry_points.append((r, 0))
+            if self.grid[r][self.cols - 1].mask & DIR_WEST:
+                entry_points.append((r, self.cols - 1))
+
+        # If no proper entry points found, fall back to the default ones
+        if not entry_points:
+            left_mid_c = self._frac_col(0.2)
+            right_mid_c = self._frac_col(0.8)
+            entry_points = [
+                (0, 0),
+                (self.rows - 1, self.cols - 1),
+                (self.rows - 1, left_mid_c),
+                (0, right_mid_c)
+            ]
+
+        return entry_points
+
+    def _compute_exit_points(self) -> frozenset:
+        """
+        Precompute the (row, col, direction) triples where a vehicle leaves
+        the map, so the per-tick exit check is a single set membership test.
+        """
+        left_mid_c = self._frac_col(0.2)
+        right_mid_c = self._frac_col(0.8)
+        return frozenset({
+            (self.rows - 1, 0, "southbound"),            # Bottom of southbound two-lane road
+            (0, self.cols - 1, "northbound"),            # Top of northbound road
+            (0, left_mid_c, "northbound"),               # Top of vertical northbound road
+            (self.rows - 1, right_mid_c, "southbound"),  # Bottom of vertical southbound road
+        })
+
+    def _index_special_cells(self) -> None:
+        """
+        Scan the built grid once and cache the positions of traffic lights
+        and pedestrian crossings, plus position -> agent-id lookup dicts,
+        so agents don't have to rescan the whole grid on their hot paths.
+        """
+        self.traffic_light_positions: List[Tuple[int, int]] = []
+        self.crossing_positions: List[Tuple[int, int]] = []
+
+        for r in range(self.rows):
+            for c in range(self.cols):
+                cell = self.grid[r][c]
+                cell.compute_mask()
+                if "traffic_light" in cell.features:
+                    self.traffic_light_positions.append((r, c))
+                if "pedestrian_crossing" in cell.features:
+                    self.crossing_positions.append((r, c))
+
+        # Position -> agent id, matching the numbering used at registration
+        self.traffic_light_id_by_pos = {
+            pos: f"traffic_light_{i + 1}"
+            for i, pos in enumerate(self.traffic_light_positions)
+        }
+        self.crossing_id_by_pos = {
+            pos: f"crossing_{i + 1}"
+            for i, pos in enumerate(self.crossing_positions)
+        }
+
+        # Position -> 0-based index into the per-tick state snapshot arrays
+        self.traffic_light_index_by_pos = {
+            pos: i for i, pos in enumerate(self.traffic_light_positions)
+        }
+        self.crossing_index_by_pos = {
+            pos: i for i, pos in enumerate(self.crossing_positions)
+        }
 
     def _frac_row(self, fraction: float) -> int:
         """
@@ -219,32 +415,54 @@ class RoadGrid:
         Print the grid in an aligned manner. Each cell is shown via
         its short_repr() (e.g. ←[T] for a westbound road with a traffic light).
         """
-        # Determine the maximum width needed for each column
-        col_widths = [0] * self.cols
-        for r in range(self.rows):
-            for c in range(self.cols):
-                cell_str = self.grid[r][c].short_repr()
-                col_widths[c] = max(col_widths[c], len(cell_str))
+        # Render every cell once, then take the per-column maximum width
+        # as a vectorized reduction instead of an interpreter loop.
+        reprs = np.array([[cell.short_repr() for cell in row] for row in self.grid])
+        col_widths = np.char.str_len(reprs).max(axis=0).tolist()
 
-        # Print each row with aligned columns
-        for r in range(self.rows):
-            row_str = " | ".join(
-                self.grid[r][c].short_repr().ljust(col_widths[c])
-                for c in range(self.cols)
-            )
-            print(row_str)
+        # Print each row with aligned columns, reusing the rendered strings
+        for row in reprs:
+            print(" | ".join(s.ljust(w) for s, w in zip(row, col_widths)))
+
+
+# In-process grid cache so the back-to-back scenarios of one run share
+# a single built grid instead of rebuilding (or re-unpickling) it.
+_grid_cache = {}
 
 
 def initialize_grid(road_size: str) -> RoadGrid:
-    """Initialize the road grid based on size."""
-    if road_size == "small":
-        grid = RoadGrid(rows=10, cols=15)
-    elif road_size == "medium":
-        grid = RoadGrid(rows=15, cols=20)
-    elif road_size == "large":
-        grid = RoadGrid(rows=20, cols=30)
-    else:
-        grid = RoadGrid(rows=10, cols=15)  # Default to small
+    """Initialize the road grid based on size, reusing the caches."""
+    sizes = {"small": (10, 15), "medium": (15, 20), "large": (20, 30)}
+    rows, cols = sizes.get(road_size, sizes["small"])
+
+    grid = _grid_cache.get(road_size)
+
+    # The build is deterministic per shape, so an unpickle replaces the
+    # whole per-cell construction on every run after the first.
+    if grid is None:
+        cache_path = _GRID_CACHE_DIR / f"{rows}x{cols}.pkl"
+        if cache_path.exists():
+            try:
+                grid = pickle.loads(cache_path.read_bytes())
+            except (pickle.UnpicklingError, EOFError, AttributeError):
+                grid = None  # Stale or corrupt cache: rebuild below
+            else:
+                if not hasattr(grid, "offers_turn"):
+                    grid = None  # Pickled by an older build: rebuild below
+
+        if grid is None:
+            grid = RoadGrid(rows=rows, cols=cols)
+            try:
+                _GRID_CACHE_DIR.mkdir(exist_ok=True)
+                cache_path.write_bytes(pickle.dumps(grid))
+            except OSError:
+                pass  # Caching is best-effort; an unwritable dir is fine
+
+        _grid_cache[road_size] = grid
+
+    # The only runtime-mutable state on the grid is the occupancy array;
+    # zero it so a reused grid starts the next scenario empty.
+    grid.occupancy[:] = 0
 
     grid.display()
     return grid
@@ -252,18 +470,7 @@ def initialize_grid(road_size: str) -> RoadGrid:
 
 def extract_special_positions(grid: RoadGrid) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]]]:
     """Extract traffic light and pedestrian crossing positions from the grid."""
-    traffic_light_positions = []
-    crossing_positions = []
-
-    for r in range(grid.rows):
-        for c in range(grid.cols):
-            cell = grid.grid[r][c]
-            if "traffic_light" in cell.features:
-                traffic_light_positions.append((r, c))
-            if "pedestrian_crossing" in cell.features:
-                crossing_positions.append((r, c))
-
-    return traffic_light_positions, crossing_positions
+    return grid.traffic_light_positions, grid.crossing_positions
 
 # --- Example Usage ---
 if __name__ == "__main__":
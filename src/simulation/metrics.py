@@ -1,11 +1,33 @@
 from typing import Dict
-import matplotlib.pyplot as plt
+
+import numpy as np
+
+# Shared (figure, axes) pair reused across display_metrics calls so the
+# second scenario in a run doesn't allocate a fresh figure.
+_fig_ax = None
+
+
+def _get_plot_axes():
+    """
+    Return the shared (figure, axes), creating them on first use. The
+    import is deferred so runs that never plot skip matplotlib entirely,
+    and the Agg backend is forced so saving a PNG never initializes a
+    GUI toolkit.
+    """
+    global _fig_ax
+    if _fig_ax is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        _fig_ax = plt.subplots(figsize=(10, 6))
+    return _fig_ax
 
 
 def display_metrics(total_vehicles: int, exited_vehicles: int, vehicle_wait_times: Dict[str, int],
                     with_parking: bool = False) -> None:
     """Display and visualize simulation metrics."""
-    all_wait_times = list(vehicle_wait_times.values())
+    wait_times = np.fromiter(vehicle_wait_times.values(), dtype=np.int32,
+                             count=len(vehicle_wait_times))
 
     print("\n===== SIMULATION METRICS =====")
     print(f"Simulation type: {'With Parking' if with_parking else 'Without Parking'}")
@@ -13,27 +35,37 @@ def display_metrics(total_vehicles: int, exited_vehicles: int, vehicle_wait_time
     print(f"Vehicles that completed the circuit: {exited_vehicles}")
     print(f"Completion rate: {exited_vehicles / total_vehicles * 100:.1f}%")
 
-    if all_wait_times:
+    if wait_times.size:
         print("\n--- Waiting Time Statistics ---")
-        print(f"Maximum wait time: {max(all_wait_times)} steps")
-        print(f"Average wait time: {sum(all_wait_times) / len(all_wait_times):.2f} steps")
+        print(f"Maximum wait time: {wait_times.max()} steps")
+        print(f"Average wait time: {wait_times.mean():.2f} steps")
+
+    if not wait_times.size:
+        return
 
-    # Visualize with matplotlib
     try:
-        plt.figure(figsize=(10, 6))
-        plt.hist(all_wait_times, bins=20, color='skyblue', edgecolor='black')
+        fig, ax = _get_plot_axes()
+    except ImportError:
+        print("\nMatplotlib not installed. Skipping visualization.")
+        return
 
-        # Add parking information to the title
-        sim_type = "With Parking" if with_parking else "Without Parking"
-        plt.title(f'Distribution of Vehicle Wait Times ({sim_type})')
-        plt.xlabel('Wait Time (steps)')
-        plt.ylabel('Number of Vehicles')
-        plt.grid(True, alpha=0.3)
+    ax.clear()
 
-        # Create different filenames based on parking status
-        filename = 'wait_time_with_parking.png' if with_parking else 'wait_time_without_parking.png'
-        plt.savefig(filename)
+    # Bin in NumPy and hand matplotlib the ready-made bars, so the
+    # figure never stores or re-scans the raw samples.
+    counts, edges = np.histogram(wait_times, bins=20)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge',
+           color='skyblue', edgecolor='black')
 
-        print(f"\nMetrics visualization saved to '{filename}'")
-    except ImportError:
-        print("\nMatplotlib not installed. Skipping visualization.")
\ No newline at end of file
+    # Add parking information to the title
+    sim_type = "With Parking" if with_parking else "Without Parking"
+    ax.set_title(f'Distribution of Vehicle Wait Times ({sim_type})')
+    ax.set_xlabel('Wait Time (steps)')
+    ax.set_ylabel('Number of Vehicles')
+    ax.grid(True, alpha=0.3)
+
+    # Create different filenames based on parking status
+    filename = 'wait_time_with_parking.png' if with_parking else 'wait_time_without_parking.png'
+    fig.savefig(filename)
+
+    print(f"\nMetrics visualization saved to '{filename}'")
@@ -1,196 +1,126 @@
 import asyncio
-import os
+import heapq
+import logging
+import numpy as np
 import pygame
-from typing import Dict, List, Tuple, Any
+from typing import Any, Dict, List, Tuple
 
 from autogen_core import (
     AgentId,
     SingleThreadedAgentRuntime,
 )
 
-from src.agents.messages import UpdateVehicleCommand, UpdateCommand
+from src.agents.messages import (UpdateVehicleCommand, UpdateCommand, VehicleTickResult,
+                                 VF_PARKED, VF_EXITING_DELAY, VF_EXITING)
 from src.agents.veichle import VehicleAgent
 from src.simulation.agent_factory import register_traffic_lights, register_pedestrian_crossings, create_new_vehicle, register_parking_agents
 from src.simulation.grid import extract_special_positions, initialize_grid
 from src.simulation.metrics import display_metrics
 from src.simulation.visualizer import PyGameVisualizer
 
+# Per-vehicle event trace; disabled by default so the tick loop pays only
+# an isEnabledFor check per event. Raise to DEBUG to follow the traffic.
+logger = logging.getLogger(__name__)
 
-async def run_simulation_without_parking(runtime: SingleThreadedAgentRuntime, simulation_time: int = 10,
-                                         road_size="small",
-                                         traffic_light_timing=(5, 4), pedestrian_crossing_timing=(1, 3)) -> None:
-    """Run the traffic simulation without parking functionality."""
-    # Initialize components
-    grid = initialize_grid(road_size)
-    visualizer = PyGameVisualizer(grid, with_parking=False)
-    traffic_light_positions, crossing_positions = extract_special_positions(grid)
-
-    # Register agents
-    traffic_light_agents = await register_traffic_lights(runtime, traffic_light_positions, traffic_light_timing)
-    crossing_agents = await register_pedestrian_crossings(runtime, grid, crossing_positions, pedestrian_crossing_timing)
-
-    # Metrics tracking
-    total_vehicles = 0
-    exited_vehicles = 0
-    vehicle_wait_times = {}
-    vehicles = {}
-    vehicle_ids = []
-    vehicle_pending = []
-    vehicles_exiting = {}
-
-    # Simulation loop
-    for t in range(simulation_time):
-        # Check for PyGame quit event
-        if not visualizer.check_events():
-            break
-
-        # Process vehicles that were marked for removal in the previous step
-        vehicles_to_remove = [vid for vid, removal_time in list(vehicles_exiting.items()) if t >= removal_time]
-        for vid in vehicles_to_remove:
-            # Find and clean up vehicle's position from tracking dictionary
-            if vid in vehicles:
-                row, col = vehicles[vid][0], vehicles[vid][1]
-                if (row, col) in VehicleAgent._all_vehicle_positions and vid in VehicleAgent._all_vehicle_positions[
-                    (row, col)]:
-                    VehicleAgent._all_vehicle_positions[(row, col)].remove(vid)
-                    # Clean up empty position entries
-                    if not VehicleAgent._all_vehicle_positions[(row, col)]:
-                        del VehicleAgent._all_vehicle_positions[(row, col)]
-
-            # Remove vehicle from other tracking structures
-            if vid in vehicle_ids:
-                vehicle_ids.remove(vid)
-            if vid in vehicles:
-                del vehicles[vid]
-            vehicles_exiting.pop(vid)
-            print(f"Vehicle {vid} has been removed from the simulation")
-
-        # Create a new vehicle every step
-        if t > 0:
-            total_vehicles += 1
-            await create_new_vehicle(runtime, grid, t, vehicle_ids, vehicle_pending, vehicle_wait_times)
-
-        # Update traffic lights and pedestrian crossings
-        traffic_light_states = await update_traffic_lights(runtime, traffic_light_agents)
-        crossing_states = await update_pedestrian_crossings(runtime, crossing_agents)
-
-        # Update vehicles
-        for vid in vehicle_ids:
-            exiting, exit_time = await process_vehicle_update(
-                runtime, vid, traffic_light_states, crossing_states,
-                vehicles, vehicle_wait_times, vehicle_pending, t
-            )
-
-            if exiting and vid not in vehicles_exiting:
-                vehicles_exiting[vid] = exit_time
-                exited_vehicles += 1
-                print(f"Vehicle {vid} has reached exit point, will be removed at step {t + 1}")
-
-        # Format vehicle positions for display
-        vehicle_display = [
-            (vid, row, col, direction, is_parked, in_parking_delay, exit_delay)
-            # Unpack all values from the vehicles dictionary
-            for vid, (row, col, direction, is_parked, in_parking_delay, exit_delay) in vehicles.items()
-            if vid not in vehicle_pending
-        ]
-
-        # Update visualization
-        visualizer.update(vehicle_display, traffic_light_states, crossing_states)
-        await asyncio.sleep(0.1)
-
-    # Show final metrics
-    display_metrics(total_vehicles, exited_vehicles, vehicle_wait_times, with_parking=False)
-    pygame.quit()
-    print("Simulation complete.")
 
-
-async def run_simulation_with_parking(runtime: SingleThreadedAgentRuntime, simulation_time: int = 10, road_size="small",
-                                      traffic_light_timing=(5, 4), pedestrian_crossing_timing=(1, 3),
-                                      avg_parking_time: int = 5,  parking_delay_steps: int = 1) -> None:
-    """Run the traffic simulation with parking functionality."""
+async def run_simulation(runtime: SingleThreadedAgentRuntime, simulation_time: int = 10, road_size="small",
+                         traffic_light_timing=(5, 4), pedestrian_crossing_timing=(1, 3),
+                         with_parking: bool = False, avg_parking_time: int = 5,
+                         parking_delay_steps: int = 1, real_time: bool = True) -> None:
+    """
+    Run the traffic simulation. One loop serves both scenarios; parking
+    registration and the delay-grid maintenance are the only
+    with_parking-conditional steps.
+    """
     # Initialize components
+    VehicleAgent.reset_class_state()
     grid = initialize_grid(road_size)
-    visualizer = PyGameVisualizer(grid, with_parking=True)
+    VehicleAgent._parking_delay_grid = np.zeros((grid.rows, grid.cols), dtype=np.int16)
+    visualizer = PyGameVisualizer(grid, with_parking=with_parking, headless=not real_time)
     traffic_light_positions, crossing_positions = extract_special_positions(grid)
 
-    VehicleAgent.PARKING_DELAY_STEPS = parking_delay_steps
-
+    if with_parking:
+        VehicleAgent.PARKING_DELAY_STEPS = parking_delay_steps
 
     # Register agents
     traffic_light_agents = await register_traffic_lights(runtime, traffic_light_positions, traffic_light_timing)
     crossing_agents = await register_pedestrian_crossings(runtime, grid, crossing_positions, pedestrian_crossing_timing)
-    parking_agents = await register_parking_agents(runtime, grid, avg_parking_time)
+    parking_agents = await register_parking_agents(runtime, grid, avg_parking_time) if with_parking else []
+
+    # Wakeup scheduling: agents are only messaged when their phase can change
+    traffic_light_states = {}
+    crossing_states = {}
+    tl_heap = make_wakeup_heap(traffic_light_agents)
+    pc_heap = make_wakeup_heap(crossing_agents)
 
     # Metrics tracking
     total_vehicles = 0
     exited_vehicles = 0
     vehicle_wait_times = {}
     vehicles = {}
-    vehicle_ids = []
-    vehicle_pending = []
-    vehicles_exiting = {}
+    vehicle_ids = {}       # dict[str, None]: insertion-ordered with O(1) removal
+    vehicle_pending = set()
+    # Scheduled removals: a min-heap of (removal_time, vid) so each tick
+    # only inspects the front, plus a set for the already-scheduled check.
+    exit_heap = []
+    exiting_scheduled = set()
 
     # Simulation loop
     for t in range(simulation_time):
-        # Check for PyGame quit event
-        if not visualizer.check_events():
+        # Check for PyGame quit event (full drain every 4th tick)
+        if not visualizer.check_events(drain=t % 4 == 0):
             break
 
-        # Process vehicles that were marked for removal in the previous step
-        vehicles_to_remove = [vid for vid, removal_time in list(vehicles_exiting.items()) if t >= removal_time]
-        for vid in vehicles_to_remove:
-            # Find and clean up vehicle's position from tracking dictionary
-            if vid in vehicles:
-                row, col = vehicles[vid][0], vehicles[vid][1]
-                if (row, col) in VehicleAgent._all_vehicle_positions and vid in VehicleAgent._all_vehicle_positions[
-                    (row, col)]:
-                    VehicleAgent._all_vehicle_positions[(row, col)].remove(vid)
-                    # Clean up empty position entries
-                    if not VehicleAgent._all_vehicle_positions[(row, col)]:
-                        del VehicleAgent._all_vehicle_positions[(row, col)]
+        # Process vehicles whose scheduled removal time has arrived
+        while exit_heap and exit_heap[0][0] <= t:
+            _, vid = heapq.heappop(exit_heap)
+            exiting_scheduled.discard(vid)
+
+            # Exiting vehicles unregister themselves at the exit point; this
+            # is only a safety net in case one did not.
+            pos = VehicleAgent._vehicle_cell.pop(vid, None)
+            if pos is not None:
+                grid.occupancy[pos] -= 1
 
             # Remove vehicle from other tracking structures
-            if vid in vehicle_ids:
-                vehicle_ids.remove(vid)
-            if vid in vehicles:
-                del vehicles[vid]
-            vehicles_exiting.pop(vid)
-            print(f"Vehicle {vid} has been removed from the simulation")
+            vehicle_ids.pop(vid, None)
+            vehicles.pop(vid, None)
+            logger.debug("Vehicle %s has been removed from the simulation", vid)
 
         # Create a new vehicle every step
         if t > 0:
             total_vehicles += 1
             await create_new_vehicle(runtime, grid, t, vehicle_ids, vehicle_pending, vehicle_wait_times)
 
-        # Update traffic lights and pedestrian crossings
-        traffic_light_states = await update_traffic_lights(runtime, traffic_light_agents)
-        crossing_states = await update_pedestrian_crossings(runtime, crossing_agents)
-        parking_status = await update_parking_agents(runtime, parking_agents, t)
-
-        # Update vehicles
-        for vid in vehicle_ids:
-            exiting, exit_time = await process_vehicle_update(
-                runtime, vid, traffic_light_states, crossing_states,
-                vehicles, vehicle_wait_times, vehicle_pending, t
+        # Update all due infrastructure agents in one fused batch
+        update_command = UpdateCommand(current_time=t)
+        await update_infrastructure(runtime, tl_heap, pc_heap,
+                                    traffic_light_states, crossing_states, update_command,
+                                    parking_agents)
+        tl_red, pc_active = build_state_snapshots(traffic_light_states, crossing_states)
+
+        # The payload is identical for every vehicle, so build the command
+        # once per tick and broadcast the same instance.
+        vehicle_command = UpdateVehicleCommand(tl_red, pc_active)
+
+        # Update vehicles in one batch, leaders first so a follower sees
+        # the cell ahead already vacated within the same tick
+        for vid, result in await update_vehicles(runtime, vehicle_ids, vehicle_command, vehicles):
+            exiting, exit_time = apply_vehicle_result(
+                vid, result, vehicles, vehicle_wait_times, vehicle_pending, t
             )
 
-            if exiting and vid not in vehicles_exiting:
-                vehicles_exiting[vid] = exit_time
+            if exiting and vid not in exiting_scheduled:
+                heapq.heappush(exit_heap, (exit_time, vid))
+                exiting_scheduled.add(vid)
                 exited_vehicles += 1
-                print(f"Vehicle {vid} has reached exit point, will be removed at step {t + 1}")
-
-
-        # Decrement parking delay counters after each full update cycle
-        if t > 0:  # Only do this once per step (with first vehicle)
-            cells_to_clear = []
-            for cell, delay_steps in VehicleAgent._parking_delay_cells.items():
-                VehicleAgent._parking_delay_cells[cell] -= 1
-                if VehicleAgent._parking_delay_cells[cell] <= 0:
-                    cells_to_clear.append(cell)
+                logger.debug("Vehicle %s has reached exit point, will be removed at step %s", vid, t + 1)
 
-            # Remove cells with no more delay
-            for cell in cells_to_clear:
-                del VehicleAgent._parking_delay_cells[cell]
+        # Decrement parking delay counters after each full update cycle;
+        # a cell is "cleared" once its counter reaches zero.
+        if with_parking and t > 0:
+            delay_grid = VehicleAgent._parking_delay_grid
+            np.subtract(delay_grid, 1, out=delay_grid, where=delay_grid > 0)
 
         # Format vehicle positions for display
         vehicle_display = [
@@ -201,150 +131,152 @@ async def run_simulation_with_parking(runtime: SingleThreadedAgentRuntime, simul
 
         # Update visualization
         visualizer.update(vehicle_display, traffic_light_states, crossing_states)
-        await asyncio.sleep(0.1)
+
+        # Wall-clock pacing for interactive viewing; benchmark/headless
+        # runs skip it and go as fast as compute allows.
+        if real_time:
+            await asyncio.sleep(0.1)
 
     # Show final metrics
-    display_metrics(total_vehicles, exited_vehicles, vehicle_wait_times, with_parking=True)
+    display_metrics(total_vehicles, exited_vehicles, vehicle_wait_times, with_parking=with_parking)
     pygame.quit()
     print("Simulation complete.")
 
 
-async def run_simulation(runtime: SingleThreadedAgentRuntime, simulation_time: int = 10, road_size="small",
-                         traffic_light_timing=(5, 4), pedestrian_crossing_timing=(1, 3),
-                         with_parking: bool = False, avg_parking_time: int = 5,
-                         parking_delay_steps: int = 1) -> None:
+async def update_vehicles(runtime: SingleThreadedAgentRuntime,
+                          vehicle_ids: Dict[str, None],
+                          command: UpdateVehicleCommand,
+                          vehicles: Dict[str, Tuple]) -> List[Tuple[str, VehicleTickResult]]:
     """
-    Dispatcher function to run the appropriate simulation based on parameters.
-
-    Args:
-        with_parking: If True, runs simulation with parking functionality
+    Dispatch one update to every vehicle in a single gather and return
+    (vid, result) pairs. The single-threaded runtime drains its queue in
+    dispatch order, so the leaders-first ordering still holds; the gather
+    just removes one event-loop round trip per vehicle.
     """
-    if with_parking:
-        await run_simulation_with_parking(runtime, simulation_time, road_size, traffic_light_timing,
-                                          pedestrian_crossing_timing, avg_parking_time, parking_delay_steps)
-    else:
-        await run_simulation_without_parking(
-            runtime, simulation_time, road_size,
-            traffic_light_timing, pedestrian_crossing_timing
-        )
-
-
-async def process_vehicle_update(runtime: SingleThreadedAgentRuntime, vid: str,
-                                 traffic_light_states: Dict[str, str],
-                                 crossing_states: Dict[str, bool],
-                                 vehicles: Dict[str, Tuple[int, int, str, bool]],
-                                 vehicle_wait_times: Dict[str, int],
-                                 vehicle_pending: List[str],
-                                 t: int) -> Tuple[bool, int]:
-    """Process updates for a single vehicle and return exiting status."""
-    old_stdout = os.dup(1)
-    r, w = os.pipe()
-    os.dup2(w, 1)
-
-    await runtime.send_message(UpdateVehicleCommand(traffic_light_states, crossing_states),
-                               AgentId(vid, "default"))
-
-    os.dup2(old_stdout, 1)
-    os.close(old_stdout)
-    os.close(w)
-
-    output = os.read(r, 10000).decode().strip()
-    os.close(r)
-
+    ordered = order_vehicles_for_update(vehicle_ids, vehicles)
+    results = await asyncio.gather(
+        *(runtime.send_message(command, AgentId(vid, "default")) for vid in ordered)
+    )
+    return list(zip(ordered, results))
+
+
+def apply_vehicle_result(vid: str, result: VehicleTickResult,
+                         vehicles: Dict[str, Tuple[int, int, str, bool]],
+                         vehicle_wait_times: Dict[str, int],
+                         vehicle_pending: set,
+                         t: int) -> Tuple[bool, int]:
+    """Fold one vehicle's tick result into the tracking structures."""
     # Check if vehicle has reached an exit point
-    exiting = "exiting=True" in output
+    exiting = bool(result.flags & VF_EXITING)
     exit_time = t + 1 if exiting else -1
 
-    # Update wait time if vehicle waited
-    if "wait_time=" in output:
-        wait_time_part = output.split("wait_time=")[1].split(",")[0]
-        try:
-            current_wait = int(wait_time_part)
-            # Only count the incremental wait time
-            if vid in vehicle_wait_times and current_wait > vehicle_wait_times[vid]:
-                vehicle_wait_times[vid] = current_wait
-        except ValueError:
-            pass
-
-    # Parse position from output
-    if "position=" in output:
-        position_part = output.split("position=")[1].split("),")[0] + ")"
-        try:
-            direction_part = output.split("direction=")[1].split(",")[0]
-        except IndexError:
-            direction_part = "unknown"  # Provide a default value
-
-        is_parked = "is_parked=True" in output
-        exiting_delay = False
-
-        # Parse the exiting_delay info from output
-        if "exiting_delay=True" in output:
-            exiting_delay = True
-
-        # Parse row and column from position string "(row,col)"
-        position_part = position_part.strip("()")
-        row, col = map(int, position_part.split(","))
-
-        # Check if this cell has a parking delay
-        in_parking_delay = (row, col) in VehicleAgent._parking_delay_cells
-
-        # Update vehicle position
-        vehicles[vid] = (row, col, direction_part, is_parked, in_parking_delay, exiting_delay)
-
-        # Remove from pending list if it was there
-        if vid in vehicle_pending:
-            vehicle_pending.remove(vid)
+    # Only count the incremental wait time
+    if vid in vehicle_wait_times and result.wait_time > vehicle_wait_times[vid]:
+        vehicle_wait_times[vid] = result.wait_time
 
-    return exiting, exit_time
+    # Check if this cell has a parking delay
+    in_parking_delay = bool(VehicleAgent._parking_delay_grid[result.row, result.col])
 
-async def update_agent_state(runtime: SingleThreadedAgentRuntime, agent_id: str,
-                             command: Any, state_key: str) -> str:
-    """Send update command to an agent and capture its state output."""
-    old_stdout = os.dup(1)
-    r, w = os.pipe()
-    os.dup2(w, 1)
+    # Update vehicle position; the display tuple keeps unpacked booleans
+    vehicles[vid] = (result.row, result.col, result.direction,
+                     bool(result.flags & VF_PARKED),
+                     in_parking_delay,
+                     bool(result.flags & VF_EXITING_DELAY))
 
-    await runtime.send_message(command, AgentId(agent_id, "default"))
+    # Remove from pending set if it was there
+    vehicle_pending.discard(vid)
 
-    os.dup2(old_stdout, 1)
-    os.close(old_stdout)
-    os.close(w)
+    return exiting, exit_time
 
-    output = os.read(r, 10000).decode().strip()
-    os.close(r)
 
-    # Parse state from output
-    if state_key in output:
-        state_part = output.split(f"{state_key}=")[1].split(",")[0]
-        return state_part
-    return ""
+def order_vehicles_for_update(vehicle_ids: Dict[str, None],
+                              vehicles: Dict[str, Tuple]) -> List[str]:
+    """
+    Order vehicle ids so that, within each traffic stream, the vehicle
+    furthest along moves first. Updating leaders before followers avoids
+    spurious capacity failures where a follower checks a cell its leader
+    has not vacated yet. Vehicles with no known position yet keep their
+    insertion order at the end.
+    """
+    def sort_key(vid):
+        state = vehicles.get(vid)
+        if state is None:
+            return (1, 0)
+        row, col, direction = state[0], state[1], state[2]
+        if direction == "northbound":
+            progress = row
+        elif direction == "southbound":
+            progress = -row
+        elif direction == "eastbound":
+            progress = -col
+        else:
+            progress = col
+        return (0, progress)
+
+    return sorted(vehicle_ids, key=sort_key)
+
+
+def build_state_snapshots(traffic_light_states: Dict[str, str],
+                          crossing_states: Dict[str, bool]) -> Tuple[List[bool], List[bool]]:
+    """
+    Flatten the per-agent state dicts into boolean lists indexed by the
+    0-based ids the grid assigns, so vehicles check lights and crossings
+    with an integer index instead of a string-keyed dict lookup.
+    """
+    tl_red = [state == "red" for state in traffic_light_states.values()]
+    pc_active = list(crossing_states.values())
+    return tl_red, pc_active
 
 
-async def update_traffic_lights(runtime: SingleThreadedAgentRuntime,
-                                traffic_light_agents: List[str]) -> Dict[str, str]:
-    """Update all traffic light agents and return their states."""
-    traffic_light_states = {}
-    for agent_id in traffic_light_agents:
-        state = await update_agent_state(runtime, agent_id, UpdateCommand(), "state")
-        if state:
-            traffic_light_states[agent_id] = state
-    return traffic_light_states
+def make_wakeup_heap(agent_ids: List[str]) -> List[Tuple[int, int, str]]:
+    """
+    Build the initial wakeup heap with every agent due at tick 0. The
+    registration index is the tiebreak, so at tick 0 the state dicts are
+    populated in registration order and index correctly into the
+    per-tick snapshots.
+    """
+    return [(0, i, agent_id) for i, agent_id in enumerate(agent_ids)]
 
 
-async def update_pedestrian_crossings(runtime: SingleThreadedAgentRuntime,
-                                      crossing_agents: List[str]) -> Dict[str, bool]:
-    """Update all pedestrian crossing agents and return their states."""
-    crossing_states = {}
-    for agent_id in crossing_agents:
-        active = await update_agent_state(runtime, agent_id, UpdateCommand(), "active")
-        if active:
-            crossing_states[agent_id] = active == "True"
-    return crossing_states
-
-
-async def update_parking_agents(runtime: SingleThreadedAgentRuntime,
-                               parking_agents: List[str],
-                               current_time: int) -> None:
-    """Update all parking agents with the current time."""
-    for agent_id in parking_agents:
-        await update_agent_state(runtime, agent_id, UpdateCommand(current_time=current_time), "None")
\ No newline at end of file
+def _pop_due(heap: List[Tuple[int, int, str]], t: int) -> List[Tuple[int, int, str]]:
+    """Pop and return every heap entry whose wakeup tick has arrived."""
+    due = []
+    while heap and heap[0][0] <= t:
+        due.append(heapq.heappop(heap))
+    return due
+
+
+async def update_infrastructure(runtime: SingleThreadedAgentRuntime,
+                                tl_heap: List[Tuple[int, int, str]],
+                                pc_heap: List[Tuple[int, int, str]],
+                                traffic_light_states: Dict[str, str],
+                                crossing_states: Dict[str, bool],
+                                command: UpdateCommand,
+                                parking_agents: List[str] = ()) -> None:
+    """
+    Dispatch all due infrastructure updates — traffic lights, crossings
+    and (when enabled) parking agents — in one gather per tick, then fold
+    the replies back into the state dicts and wakeup heaps. Agents in a
+    stable phase (a red light mid-cycle, an active crossing) are never
+    messaged until that phase can end.
+    """
+    t = command.current_time
+    tl_due = _pop_due(tl_heap, t)
+    pc_due = _pop_due(pc_heap, t)
+    agent_ids = ([agent_id for _, _, agent_id in tl_due]
+                 + [agent_id for _, _, agent_id in pc_due]
+                 + list(parking_agents))
+    if not agent_ids:
+        return
+    results = await asyncio.gather(
+        *(runtime.send_message(command, AgentId(agent_id, "default"))
+          for agent_id in agent_ids)
+    )
+    replies = iter(results)
+    for (_, idx, agent_id), result in zip(tl_due, replies):
+        traffic_light_states[agent_id] = result.state
+        heapq.heappush(tl_heap, (max(result.next_change, t + 1), idx, agent_id))
+    for (_, idx, agent_id), result in zip(pc_due, replies):
+        crossing_states[agent_id] = result.state
+        heapq.heappush(pc_heap, (max(result.next_change, t + 1), idx, agent_id))
+    # Parking agents reply with None; nothing to fold back.
@@ -1,6 +1,10 @@
+import os
+from collections import defaultdict
+
 import pygame
 
-from src.simulation.grid import RoadGrid
+from src.simulation.grid import (DIR_EAST, DIR_MASKS, DIR_NORTH, DIR_SOUTH,
+                                 DIR_WEST, F_PARKING, F_ROAD, RoadGrid)
 
 # PyGame visualization constants
 CELL_SIZE = 40  # Size of each cell in pixels
@@ -17,21 +21,57 @@ BLUE = (0, 0, 255)
 YELLOW = (255, 255, 0)
 PURPLE = (160, 32, 240)
 
+# Per-direction draw constants for vehicles, precomputed so the
+# per-vehicle loop does table lookups instead of branch chains.
+_SHARED_CELL_OFFSETS = {
+    "northbound": ((-CELL_SIZE // 4, 0), (CELL_SIZE // 4, 0)),
+    "southbound": ((-CELL_SIZE // 4, 0), (CELL_SIZE // 4, 0)),
+    "eastbound": ((0, -CELL_SIZE // 4), (0, CELL_SIZE // 4)),
+    "westbound": ((0, -CELL_SIZE // 4), (0, CELL_SIZE // 4)),
+}
+_PARKED_OFFSETS = {
+    "northbound": (-CELL_SIZE // 3, 0),   # left side
+    "southbound": (CELL_SIZE // 3, 0),    # right side
+    "eastbound": (0, -CELL_SIZE // 3),    # top side
+    "westbound": (0, CELL_SIZE // 3),     # bottom side
+}
+_BODY_SIZES = {
+    "northbound": (CELL_SIZE // 5, CELL_SIZE // 3),  # taller for vertical movement
+    "southbound": (CELL_SIZE // 5, CELL_SIZE // 3),
+    "eastbound": (CELL_SIZE // 3, CELL_SIZE // 5),   # wider for horizontal movement
+    "westbound": (CELL_SIZE // 3, CELL_SIZE // 5),
+}
+
 
 class PyGameVisualizer:
-    def __init__(self, grid: RoadGrid, with_parking: bool = False):
+    def __init__(self, grid: RoadGrid, with_parking: bool = False, headless: bool = False):
         self.grid = grid
         self.width = grid.cols * CELL_SIZE
         self.height = grid.rows * CELL_SIZE
         self.with_parking = with_parking  # Track if parking is enabled
+        self.headless = headless  # Batch runs: dummy video driver, no frame cap
         self.frame_counter = 0
 
-        # Initialize PyGame
+        # Headless batch runs render to SDL's dummy driver so they never
+        # touch a real display; must be set before pygame.init().
+        if headless:
+            os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+        # Initialize PyGame (vsync off: flip must not block on the vblank)
         pygame.init()
-        self.screen = pygame.display.set_mode((self.width, self.height))
+        self.screen = pygame.display.set_mode((self.width, self.height), flags=0, vsync=0)
         pygame.display.set_caption("Traffic Simulation")
         self.clock = pygame.time.Clock()
+        # Only QUIT matters to the loop; dropping everything else at the
+        # SDL layer keeps the event queue from accumulating Event objects
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed([pygame.QUIT])
         self.font = pygame.font.SysFont(None, 24)
+        self._big_font = pygame.font.SysFont(None, 36)
+
+        # Vehicle ID labels are a small fixed vocabulary; memoize the
+        # rendered glyphs so the hot path never touches FreeType.
+        self._vid_cache = {}
 
         # Arrow polygons for directions
         self.arrows = {
@@ -49,137 +89,189 @@ class PyGameVisualizer:
                           (CELL_SIZE // 2, 3 * CELL_SIZE // 4)]
         }
 
+        # Static draw targets for lights and crossings, precomputed from the
+        # grid's feature index so the per-frame loop is a dict lookup plus
+        # one draw call per item.
+        self._traffic_light_draws = [
+            (f"traffic_light_{i + 1}",
+             (c * CELL_SIZE + 3 * CELL_SIZE // 4, r * CELL_SIZE + CELL_SIZE // 4))
+            for i, (r, c) in enumerate(grid.traffic_light_positions)
+        ]
+        self._crossing_draws = [
+            (f"crossing_{i + 1}",
+             pygame.Rect(c * CELL_SIZE + CELL_SIZE // 4, r * CELL_SIZE + CELL_SIZE // 4,
+                         CELL_SIZE // 2, CELL_SIZE // 2))
+            for i, (r, c) in enumerate(grid.crossing_positions)
+        ]
+
+        # Pre-rendered arrow sprites keyed by (feature, lanes): the eight
+        # combinations are baked once and blitted instead of re-rasterizing
+        # polygons per cell.
+        self._arrow_sprites = self._build_arrow_sprites()
+
+        # The grid scene (lines, roads, arrows, parking markings) never
+        # changes after construction; render it once and blit per frame.
+        self._bg = self._build_background()
+
+        # Solid fill sprites for vehicle bodies keyed by (color, w, h), so
+        # the per-frame vehicle pass is one batched Surface.blits call
+        # instead of one draw.rect per vehicle.
+        self._solid_sprites = {}
+
+        # Screen regions touched by the dynamic layer this frame; the same
+        # rects are erased from the background next frame and passed to
+        # display.update so presentation cost tracks the dynamic area.
+        self._dirty_rects = []
+
+        # Snapshot of the last drawn state; identical frames skip the
+        # whole draw-and-present pass (the screen is already correct).
+        self._last_state_key = None
+
+    def _build_arrow_sprites(self):
+        sprites = {}
+        for feature, vertices in self.arrows.items():
+            # Single lane: one centered arrow
+            sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+            pygame.draw.polygon(sprite, BLACK, vertices)
+            sprites[(feature, 1)] = sprite.convert_alpha()
+
+            # Two lanes: two arrows offset per lane
+            if feature in ["northbound", "southbound"]:
+                # Horizontal offsets for vertical roads
+                offsets = [(-CELL_SIZE // 6, 0), (CELL_SIZE // 6, 0)]
+            else:
+                # Vertical offsets for horizontal roads
+                offsets = [(0, -CELL_SIZE // 6), (0, CELL_SIZE // 6)]
+            sprite = pygame.Surface((CELL_SIZE, CELL_SIZE), pygame.SRCALPHA)
+            for dx, dy in offsets:
+                pygame.draw.polygon(sprite, BLACK,
+                                    [(x + dx, y + dy) for x, y in vertices])
+            sprites[(feature, 2)] = sprite.convert_alpha()
+        return sprites
+
     def draw_grid(self):
-        self.screen.fill(WHITE)
+        self.screen.blit(self._bg, (0, 0))
+
+    def _solid_sprite(self, color, width, height):
+        sprite = self._solid_sprites.get((color, width, height))
+        if sprite is None:
+            sprite = pygame.Surface((width, height))
+            sprite.fill(color)
+            sprite = sprite.convert()
+            self._solid_sprites[(color, width, height)] = sprite
+        return sprite
+
+    def _build_background(self) -> pygame.Surface:
+        bg = pygame.Surface((self.width, self.height))
+        bg.fill(WHITE)
 
         # Draw grid lines
         for r in range(self.grid.rows + 1):
-            pygame.draw.line(self.screen, BLACK, (0, r * CELL_SIZE),
+            pygame.draw.line(bg, BLACK, (0, r * CELL_SIZE),
                              (self.width, r * CELL_SIZE))
         for c in range(self.grid.cols + 1):
-            pygame.draw.line(self.screen, BLACK, (c * CELL_SIZE, 0),
+            pygame.draw.line(bg, BLACK, (c * CELL_SIZE, 0),
                              (c * CELL_SIZE, self.height))
 
-        # Draw cells
+        # Draw cells, reading the grid's feature bitmasks instead of the
+        # per-cell string lists
+        mask_array = self.grid.mask_array
+        lanes_array = self.grid.lanes_array
         for r in range(self.grid.rows):
             for c in range(self.grid.cols):
-                cell = self.grid.grid[r][c]
+                mask = mask_array[r, c]
                 rect = pygame.Rect(c * CELL_SIZE, r * CELL_SIZE, CELL_SIZE, CELL_SIZE)
 
                 # Draw road cells
-                if cell.cell_type == "road":
-                    pygame.draw.rect(self.screen, GRAY, rect)
-
-                    # Draw direction arrows
-                    for feature in cell.features:
-                        if feature in self.arrows:
-                            # Get center of cell
-                            center_x = c * CELL_SIZE + CELL_SIZE // 2
-                            center_y = r * CELL_SIZE + CELL_SIZE // 2
-
-                            # For two-lane roads, draw two arrows with offsets
-                            if cell.lanes == 2:
-                                # Set offsets based on direction
-                                if feature in ["northbound", "southbound"]:
-                                    # Horizontal offsets for vertical roads
-                                    offsets = [(-CELL_SIZE // 6, 0), (CELL_SIZE // 6, 0)]
-                                else:
-                                    # Vertical offsets for horizontal roads
-                                    offsets = [(0, -CELL_SIZE // 6), (0, CELL_SIZE // 6)]
-
-                                # Draw first arrow (lane 1)
-                                arrow1_vertices = [(c * CELL_SIZE + x + offsets[0][0],
-                                                    r * CELL_SIZE + y + offsets[0][1])
-                                                   for x, y in self.arrows[feature]]
-                                pygame.draw.polygon(self.screen, BLACK, arrow1_vertices)
-
-                                # Draw second arrow (lane 2)
-                                arrow2_vertices = [(c * CELL_SIZE + x + offsets[1][0],
-                                                    r * CELL_SIZE + y + offsets[1][1])
-                                                   for x, y in self.arrows[feature]]
-                                pygame.draw.polygon(self.screen, BLACK, arrow2_vertices)
-                            else:
-                                # Single lane - draw one arrow
-                                arrow_vertices = [(c * CELL_SIZE + x, r * CELL_SIZE + y)
-                                                  for x, y in self.arrows[feature]]
-                                pygame.draw.polygon(self.screen, BLACK, arrow_vertices)
-
-                # Draw parking building
-                if cell.cell_type == "building" and "parking" in cell.features and self.with_parking:
+                if mask & F_ROAD:
+                    pygame.draw.rect(bg, GRAY, rect)
+
+                    # Blit the pre-rendered arrow sprite for each direction
+                    lanes = int(lanes_array[r, c])
+                    for feature, bit in DIR_MASKS.items():
+                        if mask & bit:
+                            bg.blit(self._arrow_sprites[(feature, lanes)],
+                                    (c * CELL_SIZE, r * CELL_SIZE))
+
+                # Draw parking building: a parking cell that is not road
+                if self.with_parking and mask & F_PARKING and not mask & F_ROAD:
                     # Draw parking building with a distinctive color
-                    pygame.draw.rect(self.screen, (70, 130, 180), rect)  # Steel blue color
+                    pygame.draw.rect(bg, (70, 130, 180), rect)  # Steel blue color
 
                     # Add a "P" label
-                    font = pygame.font.SysFont(None, 36)
-                    text = font.render("P", True, WHITE)
+                    text = self._big_font.render("P", True, WHITE).convert_alpha()
                     text_rect = text.get_rect(center=(c * CELL_SIZE + CELL_SIZE // 2,
                                                       r * CELL_SIZE + CELL_SIZE // 2))
-                    self.screen.blit(text, text_rect)
+                    bg.blit(text, text_rect)
 
-                # Draw parking areas
-                if "parking" in cell.features and self.with_parking:
-                    if getattr(cell, 'parking_type', None) == "street":
-                        lanes = cell.lanes
-                        if "northbound" in cell.features:
+                # Draw street parking areas
+                if self.with_parking and mask & F_PARKING and mask & F_ROAD:
+                    if self.grid.grid[r][c].parking_type == "street":
+                        lanes = int(lanes_array[r, c])
+                        if mask & DIR_NORTH:
                             # Northbound - draw on right side (east)
-                            pygame.draw.rect(self.screen, BLUE,
+                            pygame.draw.rect(bg, BLUE,
                                              (c * CELL_SIZE + 4 * CELL_SIZE // 5, r * CELL_SIZE,
                                               CELL_SIZE // 5, CELL_SIZE))
                             # Draw second parking spot if 2+ lanes
                             if lanes >= 2:
-                                pygame.draw.rect(self.screen, BLUE,
+                                pygame.draw.rect(bg, BLUE,
                                                  (c * CELL_SIZE, r * CELL_SIZE,
                                                   CELL_SIZE // 5, CELL_SIZE))
 
-                        elif "southbound" in cell.features:
+                        elif mask & DIR_SOUTH:
                             # Southbound - draw on right side (west)
-                            pygame.draw.rect(self.screen, BLUE,
+                            pygame.draw.rect(bg, BLUE,
                                              (c * CELL_SIZE, r * CELL_SIZE,
                                               CELL_SIZE // 5, CELL_SIZE))
                             # Draw second parking spot if 2+ lanes
                             if lanes >= 2:
-                                pygame.draw.rect(self.screen, BLUE,
+                                pygame.draw.rect(bg, BLUE,
                                                  (c * CELL_SIZE + 4 * CELL_SIZE // 5, r * CELL_SIZE,
                                                   CELL_SIZE // 5, CELL_SIZE))
 
-                        elif "eastbound" in cell.features:
+                        elif mask & DIR_EAST:
                             # Eastbound - draw on right side (south)
-                            pygame.draw.rect(self.screen, BLUE,
+                            pygame.draw.rect(bg, BLUE,
                                              (c * CELL_SIZE, r * CELL_SIZE + 4 * CELL_SIZE // 5,
                                               CELL_SIZE, CELL_SIZE // 5))
                             # Draw second parking spot if 2+ lanes
                             if lanes >= 2:
-                                pygame.draw.rect(self.screen, BLUE,
+                                pygame.draw.rect(bg, BLUE,
                                                  (c * CELL_SIZE, r * CELL_SIZE,
                                                   CELL_SIZE, CELL_SIZE // 5))
 
-                        elif "westbound" in cell.features:
+                        elif mask & DIR_WEST:
                             # Westbound - draw on right side (north)
-                            pygame.draw.rect(self.screen, BLUE,
+                            pygame.draw.rect(bg, BLUE,
                                              (c * CELL_SIZE, r * CELL_SIZE,
                                               CELL_SIZE, CELL_SIZE // 5))
                             # Draw second parking spot if 2+ lanes
                             if lanes >= 2:
-                                pygame.draw.rect(self.screen, BLUE,
+                                pygame.draw.rect(bg, BLUE,
                                                  (c * CELL_SIZE, r * CELL_SIZE + 4 * CELL_SIZE // 5,
                                                   CELL_SIZE, CELL_SIZE // 5))
 
+        # Match the display pixel format so the per-frame blit is a plain copy
+        return bg.convert()
+
     def draw_vehicles(self, vehicles):
-        # Group vehicles by position
-        vehicles_by_position = {}
-        for data in vehicles:
-            vid, row, col, direction, is_parked, in_parking_delay, exit_delay = data if len(data) >= 7 else (
-                *data, False, False)
-            pos = (row, col)
-            if pos not in vehicles_by_position:
-                vehicles_by_position[pos] = []
-            vehicles_by_position[pos].append((vid, direction, is_parked, in_parking_delay, exit_delay))
+        # Group vehicles by position; the simulation always hands us
+        # 7-tuples, so unpack directly
+        vehicles_by_position = defaultdict(list)
+        for vid, row, col, direction, is_parked, in_parking_delay, exit_delay in vehicles:
+            vehicles_by_position[(row, col)].append(
+                (vid, direction, is_parked, in_parking_delay, exit_delay))
 
         flash_state = (self.frame_counter // 1) % 2 == 0
 
+        # Batched draw list: vehicle bodies and labels go through one
+        # Surface.blits call, which loops in C instead of Python.
+        blit_seq = []
+
         # Draw vehicles with offsets when multiple are in same cell
         for (row, col), vehicles_here in vehicles_by_position.items():
-            cell = self.grid.grid[row][col]
+            lanes = self.grid.lanes_array[row, col]
 
             # For each vehicle at this position
             for idx, (vid, direction, is_parked, in_parking_delay, exit_delay) in enumerate(vehicles_here):
@@ -188,53 +280,20 @@ class PyGameVisualizer:
                 center_x = col * CELL_SIZE + CELL_SIZE // 2
                 center_y = row * CELL_SIZE + CELL_SIZE // 2
 
-                # Apply offset when multiple vehicles in same cell
-                offset_x, offset_y = 0, 0
-                if len(vehicles_here) > 1 and cell.lanes >= 2:
-                    if direction in ["northbound", "southbound"]:
-                        # Horizontal offset for vertical roads
-                        if idx == 0:
-                            offset_x = -CELL_SIZE // 4
-                        else:
-                            offset_x = CELL_SIZE // 4
-                    else:
-                        # Vertical offset for horizontal roads
-                        if idx == 0:
-                            offset_y = -CELL_SIZE // 4
-                        else:
-                            offset_y = CELL_SIZE // 4
-
-                # Adjust size and position if parked
-                width, height = CELL_SIZE // 5, CELL_SIZE // 3
+                # Offset when sharing a cell; a parked vehicle instead
+                # pulls to the curb side for its direction
                 if is_parked:
-                    width, height = CELL_SIZE // 6, CELL_SIZE // 4  # Smaller size
-                    if direction in ["northbound"]:
-                        # Northbound - move to the left side
-                        offset_x = -CELL_SIZE // 3
-                        offset_y = 0
-                    elif direction in ["southbound"]:
-                        # Southbound - move to the right side
-                        offset_x = CELL_SIZE // 3
-                        offset_y = 0
-                    elif direction in ["eastbound"]:
-                        # Eastbound - move to the top side
-                        offset_x = 0
-                        offset_y = -CELL_SIZE // 3
-                    elif direction in ["westbound"]:
-                        # Westbound - move to the bottom side
-                        offset_x = 0
-                        offset_y = CELL_SIZE // 3
+                    offset_x, offset_y = _PARKED_OFFSETS[direction]
+                elif len(vehicles_here) > 1 and lanes >= 2:
+                    offset_x, offset_y = _SHARED_CELL_OFFSETS[direction][1 if idx else 0]
+                else:
+                    offset_x, offset_y = 0, 0
 
                 center_x += offset_x
                 center_y += offset_y
 
-                # Set rectangle size based on direction
-                if direction in ["northbound", "southbound"]:
-                    # Taller rectangle for vertical movement
-                    width, height = CELL_SIZE // 5, CELL_SIZE // 3
-                else:
-                    # Wider rectangle for horizontal movement
-                    width, height = CELL_SIZE // 3, CELL_SIZE // 5
+                # Rectangle shape follows the direction of travel
+                width, height = _BODY_SIZES[direction]
 
                 # Calculate rectangle position (centered)
                 rect_x = center_x - width // 2
@@ -249,14 +308,17 @@ class PyGameVisualizer:
                 else:
                     vehicle_color = PURPLE  # Regular vehicles remain purple
 
-                # Draw vehicle as rectangle
-                vehicle_rect = pygame.Rect(rect_x, rect_y, width, height)
-                pygame.draw.rect(self.screen, vehicle_color, vehicle_rect)
+                # Queue vehicle body and ID label for the batched blit
+                blit_seq.append((self._solid_sprite(vehicle_color, width, height),
+                                 (rect_x, rect_y)))
+                text = self._vid_cache.get(vehicle_num)
+                if text is None:
+                    text = self.font.render(f"V{vehicle_num}", True, WHITE).convert_alpha()
+                    self._vid_cache[vehicle_num] = text
+                blit_seq.append((text, text.get_rect(center=(center_x, center_y))))
 
-                # Draw vehicle ID
-                text = self.font.render(f"V{vehicle_num}", True, WHITE)
-                text_rect = text.get_rect(center=(center_x, center_y))
-                self.screen.blit(text, text_rect)
+        if blit_seq:
+            self._dirty_rects.extend(self.screen.blits(blit_seq))
 
 
     def draw_traffic_lights(self, traffic_light_states):
@@ -266,24 +328,12 @@ class PyGameVisualizer:
         Args:
             traffic_light_states: Dictionary mapping agent_id to state ("red" or "green")
         """
-        # Find all traffic light positions
-        traffic_lights = []
-        for r in range(self.grid.rows):
-            for c in range(self.grid.cols):
-                if "traffic_light" in self.grid.grid[r][c].features:
-                    traffic_lights.append((r, c))
-
         # Draw each traffic light with its own state
-        for idx, (r, c) in enumerate(traffic_lights):
-            agent_id = f"traffic_light_{idx + 1}"
+        for agent_id, center in self._traffic_light_draws:
             state = traffic_light_states.get(agent_id, "red")  # Default to red if unknown
-
             color = GREEN if state == "green" else RED
-            pygame.draw.circle(
-                self.screen, color,
-                (c * CELL_SIZE + 3 * CELL_SIZE // 4, r * CELL_SIZE + CELL_SIZE // 4),
-                CELL_SIZE // 4
-            )
+            self._dirty_rects.append(
+                pygame.draw.circle(self.screen, color, center, CELL_SIZE // 4))
 
     def draw_crossings(self, crossing_states):
         """
@@ -292,39 +342,64 @@ class PyGameVisualizer:
         Args:
             crossing_states: Dictionary mapping agent_id to boolean (True for active)
         """
-        # Find all crossing positions
-        crossings = []
-        for r in range(self.grid.rows):
-            for c in range(self.grid.cols):
-                if "pedestrian_crossing" in self.grid.grid[r][c].features:
-                    crossings.append((r, c))
-
         # Draw each crossing with its own state
-        for idx, (r, c) in enumerate(crossings):
-            agent_id = f"crossing_{idx + 1}"
+        for agent_id, rect in self._crossing_draws:
             active = crossing_states.get(agent_id, False)  # Default to inactive if unknown
-
             crossing_color = YELLOW if active else WHITE
-            rect = pygame.Rect(
-                c * CELL_SIZE + CELL_SIZE // 4,
-                r * CELL_SIZE + CELL_SIZE // 4,
-                CELL_SIZE // 2,
-                CELL_SIZE // 2
-            )
-            pygame.draw.rect(self.screen, crossing_color, rect)
+            self._dirty_rects.append(
+                pygame.draw.rect(self.screen, crossing_color, rect))
 
     def update(self, vehicles, traffic_light_states, crossing_states):
+        # Nothing moved or changed phase: the pixels on screen are still
+        # correct, so skip drawing and presentation entirely. Frames with
+        # a parking-delay vehicle never skip — its flash phase advances
+        # with frame_counter, not with the state key.
+        state_key = (tuple(vehicles),
+                     tuple(traffic_light_states.items()),
+                     tuple(crossing_states.items()))
+        has_delay_vehicle = any(in_delay for _, _, _, _, _, in_delay, _ in vehicles)
+        if state_key == self._last_state_key and not has_delay_vehicle:
+            if not self.headless:
+                self.clock.tick(FPS)
+            return
+        self._last_state_key = state_key
+
         self.frame_counter += 1
-        self.draw_grid()
+        first_frame = self.frame_counter == 1
+
+        # Erase last frame's dynamic layer by restoring the background
+        # under its rects; the first frame paints the full background.
+        erase_rects = self._dirty_rects
+        self._dirty_rects = []
+        if first_frame:
+            self.draw_grid()
+        else:
+            for rect in erase_rects:
+                self.screen.blit(self._bg, rect, rect)
+
         self.draw_traffic_lights(traffic_light_states)
         self.draw_crossings(crossing_states)
         self.draw_vehicles(vehicles)
-        pygame.display.flip()
-        self.clock.tick(FPS)
-
-    def check_events(self):
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                pygame.quit()
-                return False
-        return True
\ No newline at end of file
+
+        # Present only the regions that changed since the last frame
+        if first_frame:
+            pygame.display.flip()
+        else:
+            pygame.display.update(erase_rects + self._dirty_rects)
+
+        # The frame cap only matters for interactive viewing; batch runs
+        # go as fast as the simulation computes.
+        if not self.headless:
+            self.clock.tick(FPS)
+
+    def check_events(self, drain: bool = True):
+        """
+        Poll the SDL event queue. A full drain handles QUIT; between
+        drains a cheap pump keeps the OS happy. Everything but QUIT is
+        blocked at the SDL layer, so peek never materializes events.
+        """
+        pygame.event.pump()
+        if drain and pygame.event.peek(pygame.QUIT):
+            pygame.quit()
+            return False
+        return True